@@ -7,255 +7,565 @@ It tests various Google Cloud APIs to identify potential cost exposure.
 """
 
 import argparse
+import asyncio
+import base64
+import dbm
+import functools
+import hashlib
+import io
+import itertools
 import json
+import os
+import re
+import shelve
 import sys
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPSConnection, HTTPException, RemoteDisconnected
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import quote_plus, unquote, urlencode, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
 
 
-# List of Google APIs to test (service_name, test_endpoint, method, description)
-GOOGLE_APIS = [
+class ApiSpec(NamedTuple):
+    """A Google API endpoint to test and how to call it."""
+    name: str
+    url: str
+    params: tuple
+    paid: bool
+    cost_info: str
+    method: str = "GET"
+    body: Optional[dict] = None
+
+    @property
+    def encoded_params(self) -> str:
+        """The urlencoded static params, encoded once per distinct params tuple."""
+        return _encode_params(self.params)
+
+    @property
+    def encoded_body(self) -> Optional[bytes]:
+        """The JSON-encoded body (None if there is none), encoded once per body."""
+        return _encode_body(self.body) if self.body else None
+
+
+@functools.lru_cache(maxsize=None)
+def _encode_params(params: tuple) -> str:
+    return urlencode(params)
+
+
+# id(body) -> (body, encoded); holding the body keeps its id from being reused
+_encoded_bodies = {}
+
+
+def _encode_body(body: dict) -> bytes:
+    cached = _encoded_bodies.get(id(body))
+    if cached is None or cached[0] is not body:
+        cached = (body, json.dumps(body).encode('utf-8'))
+        _encoded_bodies[id(body)] = cached
+    return cached[1]
+
+
+# Google APIs to test
+GOOGLE_APIS = (
     # Maps & Places APIs (can be expensive)
-    {
-        "name": "Maps Geocoding API",
-        "url": "https://maps.googleapis.com/maps/api/geocode/json",
-        "params": {"address": "1600 Amphitheatre Parkway"},
-        "paid": True,
-        "cost_info": "$5 per 1000 requests"
-    },
-    {
-        "name": "Maps Directions API",
-        "url": "https://maps.googleapis.com/maps/api/directions/json",
-        "params": {"origin": "New York", "destination": "Los Angeles"},
-        "paid": True,
-        "cost_info": "$5-10 per 1000 requests"
-    },
-    {
-        "name": "Maps Distance Matrix API",
-        "url": "https://maps.googleapis.com/maps/api/distancematrix/json",
-        "params": {"origins": "New York", "destinations": "Los Angeles"},
-        "paid": True,
-        "cost_info": "$5-10 per 1000 elements"
-    },
-    {
-        "name": "Maps Places API (Nearby Search)",
-        "url": "https://maps.googleapis.com/maps/api/place/nearbysearch/json",
-        "params": {"location": "37.7749,-122.4194", "radius": "1000"},
-        "paid": True,
-        "cost_info": "$32 per 1000 requests"
-    },
-    {
-        "name": "Maps Places API (Text Search)",
-        "url": "https://maps.googleapis.com/maps/api/place/textsearch/json",
-        "params": {"query": "restaurant"},
-        "paid": True,
-        "cost_info": "$32 per 1000 requests"
-    },
-    {
-        "name": "Maps Places API (Details)",
-        "url": "https://maps.googleapis.com/maps/api/place/details/json",
-        "params": {"place_id": "ChIJN1t_tDeuEmsRUsoyG83frY4"},
-        "paid": True,
-        "cost_info": "$17 per 1000 requests"
-    },
-    {
-        "name": "Maps Places API (Autocomplete)",
-        "url": "https://maps.googleapis.com/maps/api/place/autocomplete/json",
-        "params": {"input": "Paris"},
-        "paid": True,
-        "cost_info": "$2.83 per 1000 requests"
-    },
-    {
-        "name": "Maps Elevation API",
-        "url": "https://maps.googleapis.com/maps/api/elevation/json",
-        "params": {"locations": "39.7391536,-104.9847034"},
-        "paid": True,
-        "cost_info": "$5 per 1000 requests"
-    },
-    {
-        "name": "Maps Roads API (Snap to Roads)",
-        "url": "https://roads.googleapis.com/v1/snapToRoads",
-        "params": {"path": "60.170880,24.942795|60.170879,24.942796"},
-        "paid": True,
-        "cost_info": "$10 per 1000 requests"
-    },
-    {
-        "name": "Maps Roads API (Speed Limits)",
-        "url": "https://roads.googleapis.com/v1/speedLimits",
-        "params": {"path": "60.170880,24.942795|60.170879,24.942796"},
-        "paid": True,
-        "cost_info": "$20 per 1000 elements"
-    },
-    {
-        "name": "Geolocation API",
-        "url": "https://www.googleapis.com/geolocation/v1/geolocate",
-        "params": {},
-        "method": "POST",
-        "body": {"considerIp": True},
-        "paid": True,
-        "cost_info": "$5 per 1000 requests"
-    },
-    {
-        "name": "Maps Timezone API",
-        "url": "https://maps.googleapis.com/maps/api/timezone/json",
-        "params": {"location": "39.6034810,-119.6822510", "timestamp": "1331161200"},
-        "paid": True,
-        "cost_info": "$5 per 1000 requests"
-    },
-    {
-        "name": "Maps Static API",
-        "url": "https://maps.googleapis.com/maps/api/staticmap",
-        "params": {"center": "Brooklyn+Bridge,New+York,NY", "zoom": "13", "size": "600x300"},
-        "paid": True,
-        "cost_info": "$2 per 1000 requests"
-    },
-    {
-        "name": "Maps Street View Static API",
-        "url": "https://maps.googleapis.com/maps/api/streetview/metadata",
-        "params": {"location": "46.414382,10.013988"},
-        "paid": True,
-        "cost_info": "$7 per 1000 requests"
-    },
+    ApiSpec(
+        name="Maps Geocoding API",
+        url="https://maps.googleapis.com/maps/api/geocode/json",
+        params=(("address", "1600 Amphitheatre Parkway"),),
+        paid=True,
+        cost_info="$5 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Directions API",
+        url="https://maps.googleapis.com/maps/api/directions/json",
+        params=(("origin", "New York"), ("destination", "Los Angeles")),
+        paid=True,
+        cost_info="$5-10 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Distance Matrix API",
+        url="https://maps.googleapis.com/maps/api/distancematrix/json",
+        params=(("origins", "New York"), ("destinations", "Los Angeles")),
+        paid=True,
+        cost_info="$5-10 per 1000 elements"
+    ),
+    ApiSpec(
+        name="Maps Places API (Nearby Search)",
+        url="https://maps.googleapis.com/maps/api/place/nearbysearch/json",
+        params=(("location", "37.7749,-122.4194"), ("radius", "1000")),
+        paid=True,
+        cost_info="$32 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Places API (Text Search)",
+        url="https://maps.googleapis.com/maps/api/place/textsearch/json",
+        params=(("query", "restaurant"),),
+        paid=True,
+        cost_info="$32 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Places API (Details)",
+        url="https://maps.googleapis.com/maps/api/place/details/json",
+        params=(("place_id", "ChIJN1t_tDeuEmsRUsoyG83frY4"),),
+        paid=True,
+        cost_info="$17 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Places API (Autocomplete)",
+        url="https://maps.googleapis.com/maps/api/place/autocomplete/json",
+        params=(("input", "Paris"),),
+        paid=True,
+        cost_info="$2.83 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Elevation API",
+        url="https://maps.googleapis.com/maps/api/elevation/json",
+        params=(("locations", "39.7391536,-104.9847034"),),
+        paid=True,
+        cost_info="$5 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Roads API (Snap to Roads)",
+        url="https://roads.googleapis.com/v1/snapToRoads",
+        params=(("path", "60.170880,24.942795|60.170879,24.942796"),),
+        paid=True,
+        cost_info="$10 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Roads API (Speed Limits)",
+        url="https://roads.googleapis.com/v1/speedLimits",
+        params=(("path", "60.170880,24.942795|60.170879,24.942796"),),
+        paid=True,
+        cost_info="$20 per 1000 elements"
+    ),
+    ApiSpec(
+        name="Geolocation API",
+        url="https://www.googleapis.com/geolocation/v1/geolocate",
+        params=(),
+        method="POST",
+        body={"considerIp": True},
+        paid=True,
+        cost_info="$5 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Timezone API",
+        url="https://maps.googleapis.com/maps/api/timezone/json",
+        params=(("location", "39.6034810,-119.6822510"), ("timestamp", "1331161200")),
+        paid=True,
+        cost_info="$5 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Static API",
+        url="https://maps.googleapis.com/maps/api/staticmap",
+        params=(("center", "Brooklyn+Bridge,New+York,NY"), ("zoom", "13"), ("size", "600x300")),
+        paid=True,
+        cost_info="$2 per 1000 requests"
+    ),
+    ApiSpec(
+        name="Maps Street View Static API",
+        url="https://maps.googleapis.com/maps/api/streetview/metadata",
+        params=(("location", "46.414382,10.013988"),),
+        paid=True,
+        cost_info="$7 per 1000 requests"
+    ),
     # AI/ML APIs
-    {
-        "name": "Cloud Vision API",
-        "url": "https://vision.googleapis.com/v1/images:annotate",
-        "params": {},
-        "method": "POST",
-        "body": {"requests": [{"features": [{"type": "LABEL_DETECTION"}]}]},
-        "paid": True,
-        "cost_info": "$1.50 per 1000 images"
-    },
-    {
-        "name": "Cloud Natural Language API",
-        "url": "https://language.googleapis.com/v1/documents:analyzeSentiment",
-        "params": {},
-        "method": "POST",
-        "body": {"document": {"type": "PLAIN_TEXT", "content": "Hello world"}},
-        "paid": True,
-        "cost_info": "$1-2 per 1000 records"
-    },
-    {
-        "name": "Cloud Translation API",
-        "url": "https://translation.googleapis.com/language/translate/v2",
-        "params": {"q": "Hello", "target": "es"},
-        "paid": True,
-        "cost_info": "$20 per 1M characters"
-    },
-    {
-        "name": "Cloud Speech-to-Text API",
-        "url": "https://speech.googleapis.com/v1/speech:recognize",
-        "params": {},
-        "method": "POST",
-        "body": {"config": {"languageCode": "en-US"}},
-        "paid": True,
-        "cost_info": "$0.006 per 15 seconds"
-    },
-    {
-        "name": "Cloud Text-to-Speech API",
-        "url": "https://texttospeech.googleapis.com/v1/voices",
-        "params": {},
-        "paid": True,
-        "cost_info": "$4-16 per 1M characters"
-    },
-    {
-        "name": "Generative Language API (Gemini)",
-        "url": "https://generativelanguage.googleapis.com/v1/models",
-        "params": {},
-        "paid": True,
-        "cost_info": "Varies by model"
-    },
+    ApiSpec(
+        name="Cloud Vision API",
+        url="https://vision.googleapis.com/v1/images:annotate",
+        params=(),
+        method="POST",
+        body={"requests": [{"features": [{"type": "LABEL_DETECTION"}]}]},
+        paid=True,
+        cost_info="$1.50 per 1000 images"
+    ),
+    ApiSpec(
+        name="Cloud Natural Language API",
+        url="https://language.googleapis.com/v1/documents:analyzeSentiment",
+        params=(),
+        method="POST",
+        body={"document": {"type": "PLAIN_TEXT", "content": "Hello world"}},
+        paid=True,
+        cost_info="$1-2 per 1000 records"
+    ),
+    ApiSpec(
+        name="Cloud Translation API",
+        url="https://translation.googleapis.com/language/translate/v2",
+        params=(("q", "Hello"), ("target", "es")),
+        paid=True,
+        cost_info="$20 per 1M characters"
+    ),
+    ApiSpec(
+        name="Cloud Speech-to-Text API",
+        url="https://speech.googleapis.com/v1/speech:recognize",
+        params=(),
+        method="POST",
+        body={"config": {"languageCode": "en-US"}},
+        paid=True,
+        cost_info="$0.006 per 15 seconds"
+    ),
+    ApiSpec(
+        name="Cloud Text-to-Speech API",
+        url="https://texttospeech.googleapis.com/v1/voices",
+        params=(),
+        paid=True,
+        cost_info="$4-16 per 1M characters"
+    ),
+    ApiSpec(
+        name="Generative Language API (Gemini)",
+        url="https://generativelanguage.googleapis.com/v1/models",
+        params=(),
+        paid=True,
+        cost_info="Varies by model"
+    ),
     # YouTube APIs
-    {
-        "name": "YouTube Data API v3",
-        "url": "https://www.googleapis.com/youtube/v3/search",
-        "params": {"part": "snippet", "q": "test", "maxResults": "1"},
-        "paid": False,
-        "cost_info": "Free with quota limits"
-    },
+    ApiSpec(
+        name="YouTube Data API v3",
+        url="https://www.googleapis.com/youtube/v3/search",
+        params=(("part", "snippet"), ("q", "test"), ("maxResults", "1")),
+        paid=False,
+        cost_info="Free with quota limits"
+    ),
     # Other APIs
-    {
-        "name": "Firebase Cloud Messaging (FCM)",
-        "url": "https://fcm.googleapis.com/fcm/send",
-        "params": {},
-        "method": "POST",
-        "body": {"registration_ids": ["test"]},
-        "paid": False,
-        "cost_info": "Free (but can be abused for spam)"
-    },
-    {
-        "name": "Custom Search API",
-        "url": "https://www.googleapis.com/customsearch/v1",
-        "params": {"q": "test", "cx": "000000000000000000000:aaaaaaaaaaa"},
-        "paid": True,
-        "cost_info": "$5 per 1000 queries (after free tier)"
-    },
-    {
-        "name": "PageSpeed Insights API",
-        "url": "https://www.googleapis.com/pagespeedonline/v5/runPagespeed",
-        "params": {"url": "https://www.google.com"},
-        "paid": False,
-        "cost_info": "Free"
-    },
-    {
-        "name": "Safe Browsing API",
-        "url": "https://safebrowsing.googleapis.com/v4/threatLists",
-        "params": {},
-        "paid": False,
-        "cost_info": "Free"
-    },
-    {
-        "name": "Civic Information API",
-        "url": "https://www.googleapis.com/civicinfo/v2/elections",
-        "params": {},
-        "paid": False,
-        "cost_info": "Free"
-    },
-    {
-        "name": "Fact Check Tools API",
-        "url": "https://factchecktools.googleapis.com/v1alpha1/claims:search",
-        "params": {"query": "test"},
-        "paid": False,
-        "cost_info": "Free"
-    },
-]
-
-
-def test_api(api_info: dict, api_key: str, verbose: bool = False) -> dict:
-    """Test a single API endpoint with the given API key."""
-    url = api_info["url"]
-    params = api_info.get("params", {}).copy()
-    params["key"] = api_key
-    method = api_info.get("method", "GET")
-
-    result = {
-        "name": api_info["name"],
+    ApiSpec(
+        name="Firebase Cloud Messaging (FCM)",
+        url="https://fcm.googleapis.com/fcm/send",
+        params=(),
+        method="POST",
+        body={"registration_ids": ["test"]},
+        paid=False,
+        cost_info="Free (but can be abused for spam)"
+    ),
+    ApiSpec(
+        name="Custom Search API",
+        url="https://www.googleapis.com/customsearch/v1",
+        params=(("q", "test"), ("cx", "000000000000000000000:aaaaaaaaaaa")),
+        paid=True,
+        cost_info="$5 per 1000 queries (after free tier)"
+    ),
+    ApiSpec(
+        name="PageSpeed Insights API",
+        url="https://www.googleapis.com/pagespeedonline/v5/runPagespeed",
+        params=(("url", "https://www.google.com"),),
+        paid=False,
+        cost_info="Free"
+    ),
+    ApiSpec(
+        name="Safe Browsing API",
+        url="https://safebrowsing.googleapis.com/v4/threatLists",
+        params=(),
+        paid=False,
+        cost_info="Free"
+    ),
+    ApiSpec(
+        name="Civic Information API",
+        url="https://www.googleapis.com/civicinfo/v2/elections",
+        params=(),
+        paid=False,
+        cost_info="Free"
+    ),
+    ApiSpec(
+        name="Fact Check Tools API",
+        url="https://factchecktools.googleapis.com/v1alpha1/claims:search",
+        params=(("query", "test"),),
+        paid=False,
+        cost_info="Free"
+    ),
+)
+
+
+# Redirects are followed like urlopen did, up to the same limit
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections shared between checks, keyed by host.
+
+    Most endpoints live on a handful of hosts (maps.googleapis.com,
+    www.googleapis.com), so reusing connections saves a TCP and TLS handshake
+    for nearly every request. Safe to use from multiple threads.
+
+    Connecting (including the TLS handshake) has its own, shorter timeout than
+    waiting for a response, so unreachable endpoints fail fast. Like urlopen,
+    redirects are followed and proxies from the environment (HTTPS_PROXY,
+    HTTP_PROXY, NO_PROXY) are used unless explicit proxies are given.
+    """
+
+    def __init__(self, maxsize: int = 16, connect_timeout: float = 2, read_timeout: float = 8,
+                 proxies: Optional[dict] = None):
+        self.maxsize = maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.proxies = getproxies() if proxies is None else proxies
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _proxy_for(self, scheme: str, host: str):
+        proxy = self.proxies.get(scheme)
+        if not proxy or proxy_bypass(host):
+            return None
+        if "://" not in proxy:
+            proxy = f"http://{proxy}"
+        return urlsplit(proxy)
+
+    @staticmethod
+    def _proxy_headers(proxy) -> dict:
+        if not proxy.username:
+            return {}
+        credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+        return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode('utf-8')).decode('ascii')}
+
+    def _get_connection(self, scheme: str, host: str, proxy):
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return idle.pop(), True
+        if proxy is None:
+            connection_class = HTTPSConnection if scheme == "https" else HTTPConnection
+            return connection_class(host, timeout=self.connect_timeout), False
+
+        proxy_port = proxy.port or (443 if proxy.scheme == "https" else 80)
+        if scheme != "https":
+            # Plain HTTP is sent to the proxy as is, with the full URL as the path
+            return HTTPConnection(proxy.hostname, proxy_port, timeout=self.connect_timeout), False
+        conn = HTTPSConnection(proxy.hostname, proxy_port, timeout=self.connect_timeout)
+        conn.set_tunnel(host, headers=self._proxy_headers(proxy))
+        return conn, False
+
+    def _put_connection(self, scheme: str, host: str, conn):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host), [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _send(self, method: str, url: str, body: Optional[bytes], headers: dict):
+        parts = urlsplit(url)
+        path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        proxy = self._proxy_for(parts.scheme, parts.netloc)
+        if proxy and parts.scheme != "https":
+            path = url
+            headers = {**headers, **self._proxy_headers(proxy)}
+
+        conn, reused = self._get_connection(parts.scheme, parts.netloc, proxy)
+        try:
+            if conn.sock is None:
+                conn.connect()
+                conn.sock.settimeout(self.read_timeout)
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection - retry on a fresh one
+            return self._send(method, url, body, headers)
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._put_connection(parts.scheme, parts.netloc, conn)
+        return response, data
+
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None):
+        """Send a request and return the final response along with its full body.
+
+        If there are too many redirects, the last redirect response is returned.
+        """
+        headers = headers or {}
+        for _ in range(MAX_REDIRECTS + 1):
+            response, data = self._send(method, url, body, headers)
+            location = response.getheader("Location")
+            if response.status not in REDIRECT_STATUSES or not location:
+                break
+            url = urljoin(url, location)
+            if response.status in (301, 302, 303):
+                # Same as urlopen: the redirected request is a GET without the body
+                method = "GET"
+                body = None
+                headers = {k: v for k, v in headers.items() if k.lower() != "content-type"}
+        return response, data
+
+
+# Number of checks run in parallel; the pool keeps as many idle connections per host
+MAX_WORKERS = 16
+
+HTTP_POOL = ConnectionPool(maxsize=MAX_WORKERS, connect_timeout=2, read_timeout=8)
+
+CACHE_PATH = os.path.expanduser("~/.cache/keychecker.db")
+CACHE_TTL = 60  # seconds
+
+
+class ResultCache:
+    """Short-lived on-disk cache of check results for repeated runs.
+
+    Results are keyed by endpoint, API key and verbosity, so only a different
+    key (or an expired entry) triggers new network calls. Safe to use from
+    multiple threads. The files are private to the user, since they record
+    which services each key can reach.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        self.ttl = ttl
+        self._db = shelve.Shelf(dbm.open(path, "c", 0o600))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(api_info: ApiSpec, api_key: str, verbose: bool) -> str:
+        raw_key = f"{api_info.method}|{api_info.url}|{api_info.params}|{api_key}|{verbose}"
+        return hashlib.blake2b(raw_key.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return a copy of a fresh cached result, marked as cached, or None.
+
+        An entry that can't be read (corrupt file, concurrent writer, ...) is
+        dropped and treated as a miss, so the endpoint is tested again.
+        """
+        with self._lock:
+            try:
+                entry = self._db.get(key)
+                if not (entry and time.time() - entry["ts"] < self.ttl):
+                    return None
+                result = entry["result"]
+                result["cached"] = True
+                return result
+            except Exception:
+                try:
+                    del self._db[key]
+                except Exception:
+                    pass
+                return None
+
+    def put(self, key: str, result: dict):
+        """Store a result; write errors (disk full, ...) only lose the cache entry."""
+        try:
+            with self._lock:
+                self._db[key] = {"ts": time.time(), "result": result}
+        except Exception:
+            pass
+
+    def close(self):
+        try:
+            with self._lock:
+                self._db.close()
+        except Exception:
+            pass
+
+
+def open_result_cache(path: str = CACHE_PATH) -> Optional[ResultCache]:
+    """Open the result cache, or return None if it can't be used.
+
+    An unwritable location or a corrupt index (e.g. from two runs writing at
+    once - dbm.dumb has no locking) just means running without the cache.
+    """
+    try:
+        return ResultCache(path)
+    except Exception:
+        return None
+
+
+# Phrases that indicate the key cannot access the API
+DENIAL_PHRASES = (
+    "not authorized",
+    "not enabled",
+    "enable billing",
+    "api key not valid",
+    "invalid api key",
+    "permission denied",
+    "access denied",
+    "has not been used in project",
+    "api is not enabled",
+)
+
+# Markers in a raw error response body that settle the result without parsing it
+DENIAL_MARKERS = (
+    (b"has not been used", "API not enabled for this project"),
+    (b"API_KEY_INVALID", "Invalid API key"),
+)
+
+# Error message classifiers, compiled once instead of scanning phrase by phrase
+_DENIAL_RE = re.compile("|".join(map(re.escape, DENIAL_PHRASES)), re.IGNORECASE)
+_NOT_ENABLED_RE = re.compile("has not been used|is not enabled")
+_INVALID_KEY_RE = re.compile("API key not valid|invalid", re.IGNORECASE)
+_DENIED_RE = re.compile("denied", re.IGNORECASE)
+
+# Top-level fields that carry errors in Google API responses
+_ERROR_FIELD_MARKERS = (b'"error', b'"status"')
+
+
+def parse_if_may_hold_errors(raw: bytes) -> dict:
+    """Fully parse a response body, or skip parsing if it can't hold error fields.
+
+    This is a skip-or-full-parse gate, not a partial parser: a body that mentions
+    '"error' or '"status"' anywhere (even in nested fields) is parsed completely.
+    Successful responses (search results, place details, ...) can be large and
+    usually mention neither, so they skip the JSON decoder and yield {}.
+    """
+    if not any(marker in raw for marker in _ERROR_FIELD_MARKERS):
+        return {}
+    return json.loads(raw)
+
+
+def build_query(static_encoded: str, key: str) -> str:
+    """Append the API key to an already urlencoded query string."""
+    key_param = f"key={quote_plus(key)}"
+    return f"{static_encoded}&{key_param}" if static_encoded else key_param
+
+
+def new_result(api_info: ApiSpec) -> dict:
+    """Return a blank (not accessible) result for an API."""
+    return {
+        "name": api_info.name,
         "accessible": False,
-        "paid": api_info["paid"],
-        "cost_info": api_info["cost_info"],
+        "paid": api_info.paid,
+        "cost_info": api_info.cost_info,
         "status": None,
         "error": None,
         "request": None,
-        "response": None
+        "response": None,
+        "cached": False
     }
 
+
+def test_api(api_info: ApiSpec, api_key: str, masked_key: str, verbose: bool = False,
+             cache: Optional[ResultCache] = None) -> dict:
+    """Test a single API endpoint with the given API key.
+
+    masked_key is the form of the key shown in logged request URLs.
+    """
+    if cache:
+        cache_key = cache.make_key(api_info, api_key, verbose)
+        cached = cache.get(cache_key)
+        if cached:
+            return cached
+
+    url = api_info.url
+    method = api_info.method
+    result = new_result(api_info)
+
     try:
-        if method == "GET":
-            # Mask the API key in logged URL
-            display_params = params.copy()
-            display_params["key"] = api_key[:8] + "..." + api_key[-4:] if len(api_key) > 12 else "***"
-            full_url = f"{url}?{urlencode(params)}"
-            display_url = f"{url}?{urlencode(display_params)}"
-            req = Request(full_url)
-            request_body = None
-        else:
-            display_url = f"{url}?key={api_key[:8]}...{api_key[-4:]}" if len(api_key) > 12 else f"{url}?key=***"
-            full_url = f"{url}?key={api_key}"
-            request_body = api_info.get("body", {})
-            body = json.dumps(request_body).encode('utf-8')
-            req = Request(full_url, data=body, method=method)
-            req.add_header('Content-Type', 'application/json')
+        full_url = f"{url}?{build_query(api_info.encoded_params, api_key)}"
+        display_url = f"{url}?{build_query(api_info.encoded_params, masked_key)}"
+
+        # GET requests never carry a body; others send their pre-encoded one, if any
+        body = api_info.encoded_body if method != "GET" else None
+        request_body = api_info.body if body else None
+        headers = {'Content-Type': 'application/json'} if body else {}
 
         if verbose:
             result["request"] = {
@@ -264,49 +574,72 @@ def test_api(api_info: dict, api_key: str, verbose: bool = False) -> dict:
                 "body": request_body
             }
 
-        with urlopen(req, timeout=10) as response:
-            result["status"] = response.status
-            response_data = response.read().decode('utf-8')
+        response, raw = HTTP_POOL.request(method, full_url, body=body, headers=headers)
+        result["status"] = response.status
+
+        if verbose:
+            result["response"] = {
+                "status_code": response.status,
+                # Only the first few headers are ever shown
+                "headers": dict(itertools.islice(response.headers.items(), 5)),
+                "body": None
+            }
 
-            if verbose:
-                result["response"] = {
-                    "status_code": response.status,
-                    "headers": dict(response.headers),
-                    "body": None
-                }
+        # Denied keys are the common case - error bodies with a known marker settle the
+        # result without JSON parsing (verbose mode still parses them for display)
+        marker_error = next((error for marker, error in DENIAL_MARKERS if marker in raw),
+                            None) if response.status >= 400 else None
+
+        if marker_error and not verbose:
+            result["error"] = marker_error
+        elif 300 <= response.status < 400:
+            # Redirects are followed, so one left over means the API was never reached
+            result["error"] = "Unexpected redirect"
+        elif response.status >= 400:
+            http_error = f"HTTP Error {response.status}: {response.reason}"
+            try:
+                error_json = json.loads(raw)
 
+                if verbose:
+                    result["response"]["body"] = error_json
+
+                if marker_error:
+                    result["error"] = marker_error
+                elif "error" in error_json:
+                    error_msg = error_json["error"].get("message", http_error)
+                    # Check if it's a "not enabled" vs "invalid key" error
+                    if _NOT_ENABLED_RE.search(error_msg):
+                        result["error"] = "API not enabled for this project"
+                    elif _INVALID_KEY_RE.search(error_msg):
+                        result["error"] = "Invalid API key"
+                    elif _DENIED_RE.search(error_msg):
+                        result["error"] = "Access denied"
+                    else:
+                        result["error"] = error_msg
+                else:
+                    result["error"] = http_error
+            except:
+                result["error"] = http_error
+        else:
             # Check for API-specific error responses that come with 200 status
             try:
-                json_response = json.loads(response_data)
+                json_response = json.loads(raw) if verbose else parse_if_may_hold_errors(raw)
                 if verbose:
                     # Truncate response body if too large
-                    if len(response_data) > 1000:
-                        result["response"]["body"] = json.loads(response_data[:1000] + '..."truncated"...')
+                    if len(raw) > 1000:
+                        result["response"]["body"] = {"_truncated": raw[:1000].decode('utf-8', errors='replace')}
                     else:
                         result["response"]["body"] = json_response
 
                 # Check for various error patterns in Google API responses
+                error = json_response.get("error") or {}
+                code = error.get("code")
+                status = json_response.get("status", "")
                 error_msg = (json_response.get("error_message") or
                             json_response.get("errorMessage") or
-                            json_response.get("error", {}).get("message") or "")
-                status = json_response.get("status", "")
+                            error.get("message") or "")
 
-                # Phrases that indicate the key cannot access the API
-                denial_phrases = [
-                    "not authorized",
-                    "not enabled",
-                    "enable billing",
-                    "api key not valid",
-                    "invalid api key",
-                    "permission denied",
-                    "access denied",
-                    "has not been used in project",
-                    "api is not enabled",
-                ]
-
-                is_denied = any(phrase in error_msg.lower() for phrase in denial_phrases)
-
-                if "error" in json_response and json_response["error"].get("code") in (401, 403):
+                if code in (401, 403):
                     # HTTP-style error in JSON body - clearly denied
                     result["accessible"] = False
                     result["error"] = error_msg or "Access denied"
@@ -318,66 +651,109 @@ def test_api(api_info: dict, api_key: str, verbose: bool = False) -> dict:
                     # Hit rate limits - but key HAS access
                     result["accessible"] = True
                     result["error"] = f"Rate limited (but key has access): {error_msg}"
-                elif is_denied:
+                elif _DENIAL_RE.search(error_msg):
                     # Clear denial phrase in error message
                     result["accessible"] = False
                     result["error"] = error_msg
                 else:
                     result["accessible"] = True
-            except json.JSONDecodeError:
+            except ValueError:
                 # Non-JSON response (like images) - if we got here, it's accessible
                 result["accessible"] = True
                 if verbose:
-                    result["response"]["body"] = f"<binary or non-JSON data, {len(response_data)} bytes>"
+                    result["response"]["body"] = f"<binary or non-JSON data, {len(raw)} bytes>"
 
-    except HTTPError as e:
-        result["status"] = e.code
-        try:
-            error_body = e.read().decode('utf-8')
-            error_json = json.loads(error_body)
-
-            if verbose:
-                result["request"] = {
-                    "method": method,
-                    "url": display_url,
-                    "body": request_body if method != "GET" else None
-                }
-                result["response"] = {
-                    "status_code": e.code,
-                    "headers": dict(e.headers) if hasattr(e, 'headers') else {},
-                    "body": error_json
-                }
-
-            if "error" in error_json:
-                error_msg = error_json["error"].get("message", str(e))
-                # Check if it's a "not enabled" vs "invalid key" error
-                if "has not been used" in error_msg or "is not enabled" in error_msg:
-                    result["error"] = "API not enabled for this project"
-                elif "API key not valid" in error_msg or "invalid" in error_msg.lower():
-                    result["error"] = "Invalid API key"
-                elif "denied" in error_msg.lower():
-                    result["error"] = "Access denied"
-                else:
-                    result["error"] = error_msg
-            else:
-                result["error"] = str(e)
-        except:
-            result["error"] = str(e)
-
-    except URLError as e:
-        result["error"] = f"Connection error: {e.reason}"
-        if verbose:
-            result["request"] = {
-                "method": method,
-                "url": display_url,
-                "body": request_body if method != "GET" else None
-            }
+    except (OSError, HTTPException) as e:
+        result["error"] = f"Connection error: {e}"
     except Exception as e:
         result["error"] = str(e)
 
+    # Only cache answers from the API, not connection failures
+    if cache and result["status"] is not None:
+        cache.put(cache_key, result)
+
     return result
 
 
+async def run_all(apis_to_test: list, api_key: str, masked_key: str, verbose: bool = False,
+                  cache: Optional[ResultCache] = None,
+                  on_result: Optional[Callable[[dict], None]] = None) -> list:
+    """Test all API endpoints concurrently, returning results in input order.
+
+    on_result, if given, is called with each result as soon as it is ready.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def check(api: ApiSpec) -> dict:
+        try:
+            return await loop.run_in_executor(executor, test_api, api, api_key, masked_key,
+                                              verbose, cache)
+        except Exception as e:
+            # One failing check must not take the other results down with it
+            result = new_result(api)
+            result["error"] = str(e)
+            return result
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        tasks = [loop.create_task(check(api)) for api in apis_to_test]
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if on_result:
+                on_result(result)
+        return [task.result() for task in tasks]
+
+
+def render_one(result: dict, verbose: bool = False):
+    """Print a single test result to the console."""
+    if not (result["accessible"] or verbose):
+        return
+
+    status_icon = "\033[92m[ACCESSIBLE]\033[0m" if result["accessible"] else "\033[91m[BLOCKED]\033[0m"
+    paid_tag = "\033[93m[PAID]\033[0m" if result["paid"] else "[FREE]"
+    cached_tag = " (cached)" if result["cached"] else ""
+
+    # Build the whole entry first so it reaches the terminal in a single write
+    out = io.StringIO()
+    print(f"{status_icon} {paid_tag} {result['name']}{cached_tag}", file=out)
+    if result["accessible"] and result["paid"]:
+        print(f"           Cost: {result['cost_info']}", file=out)
+    if verbose and result["error"]:
+        print(f"           Error: {result['error']}", file=out)
+
+    # Show request/response details in verbose mode
+    if verbose and result["request"]:
+        print(f"\n           \033[96m--- REQUEST ---\033[0m", file=out)
+        print(f"           Method: {result['request']['method']}", file=out)
+        print(f"           URL: {result['request']['url']}", file=out)
+        if result['request']['body']:
+            print(f"           Body: {json.dumps(result['request']['body'], indent=12)}", file=out)
+
+    if verbose and result["response"]:
+        print(f"\n           \033[96m--- RESPONSE ---\033[0m", file=out)
+        print(f"           Status: {result['response']['status_code']}", file=out)
+        if result['response'].get('headers'):
+            print(f"           Headers:", file=out)
+            for k, v in result['response']['headers'].items():
+                print(f"             {k}: {v[:50]}..." if len(str(v)) > 50 else f"             {k}: {v}", file=out)
+        if result['response'].get('body'):
+            body_str = json.dumps(result['response']['body'], indent=2)
+            # Truncate long responses
+            if len(body_str) > 500:
+                body_lines = body_str[:500].split('\n')
+                print(f"           Body (truncated):", file=out)
+                for line in body_lines:
+                    print(f"             {line}", file=out)
+                print(f"             ... (truncated)", file=out)
+            else:
+                print(f"           Body:", file=out)
+                for line in body_str.split('\n'):
+                    print(f"             {line}", file=out)
+        print(file=out)
+
+    sys.stdout.write(out.getvalue())
+    sys.stdout.flush()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Check which Google services are accessible with an API key",
@@ -396,14 +772,18 @@ Examples:
                         help="Output results as JSON")
     parser.add_argument("--verbose", "-v", action="store_true",
                         help="Show all results, not just accessible services")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Don't reuse results cached by runs in the last {CACHE_TTL} seconds")
 
     args = parser.parse_args()
 
+    # Mask the API key in logged URLs
+    masked_key = f"{args.api_key[:8]}...{args.api_key[-4:]}" if len(args.api_key) > 12 else "***"
+
     apis_to_test = GOOGLE_APIS
     if args.paid_only:
-        apis_to_test = [api for api in GOOGLE_APIS if api["paid"]]
+        apis_to_test = [api for api in GOOGLE_APIS if api.paid]
 
-    results = []
     accessible_paid = []
     accessible_free = []
 
@@ -411,57 +791,25 @@ Examples:
         print(f"\nTesting Google API key against {len(apis_to_test)} services...\n")
         print("-" * 70)
 
-    for api in apis_to_test:
-        result = test_api(api, args.api_key, verbose=args.verbose)
-        results.append(result)
+    cache = None if args.no_cache else open_result_cache()
+
+    # Print each result as soon as it arrives; JSON output waits for all of them
+    on_result = None if args.json else (lambda result: render_one(result, args.verbose))
 
+    try:
+        results = asyncio.run(run_all(apis_to_test, args.api_key, masked_key, verbose=args.verbose,
+                                      cache=cache, on_result=on_result))
+    finally:
+        if cache:
+            cache.close()
+
+    for result in results:
         if result["accessible"]:
             if result["paid"]:
                 accessible_paid.append(result)
             else:
                 accessible_free.append(result)
 
-        if not args.json:
-            status_icon = "\033[92m[ACCESSIBLE]\033[0m" if result["accessible"] else "\033[91m[BLOCKED]\033[0m"
-            paid_tag = "\033[93m[PAID]\033[0m" if result["paid"] else "[FREE]"
-
-            if result["accessible"] or args.verbose:
-                print(f"{status_icon} {paid_tag} {result['name']}")
-                if result["accessible"] and result["paid"]:
-                    print(f"           Cost: {result['cost_info']}")
-                if args.verbose and result["error"]:
-                    print(f"           Error: {result['error']}")
-
-                # Show request/response details in verbose mode
-                if args.verbose and result["request"]:
-                    print(f"\n           \033[96m--- REQUEST ---\033[0m")
-                    print(f"           Method: {result['request']['method']}")
-                    print(f"           URL: {result['request']['url']}")
-                    if result['request']['body']:
-                        print(f"           Body: {json.dumps(result['request']['body'], indent=12)}")
-
-                if args.verbose and result["response"]:
-                    print(f"\n           \033[96m--- RESPONSE ---\033[0m")
-                    print(f"           Status: {result['response']['status_code']}")
-                    if result['response'].get('headers'):
-                        print(f"           Headers:")
-                        for k, v in list(result['response']['headers'].items())[:5]:
-                            print(f"             {k}: {v[:50]}..." if len(str(v)) > 50 else f"             {k}: {v}")
-                    if result['response'].get('body'):
-                        body_str = json.dumps(result['response']['body'], indent=2)
-                        # Truncate long responses
-                        if len(body_str) > 500:
-                            body_lines = body_str[:500].split('\n')
-                            print(f"           Body (truncated):")
-                            for line in body_lines:
-                                print(f"             {line}")
-                            print(f"             ... (truncated)")
-                        else:
-                            print(f"           Body:")
-                            for line in body_str.split('\n'):
-                                print(f"             {line}")
-                    print()
-
     if args.json:
         output = {
             "total_tested": len(results),
@@ -471,27 +819,34 @@ Examples:
         }
         print(json.dumps(output, indent=2))
     else:
-        print("-" * 70)
-        print(f"\n{'='*70}")
-        print("SUMMARY")
-        print(f"{'='*70}")
-        print(f"Total APIs tested: {len(results)}")
-        print(f"\033[92mAccessible paid services: {len(accessible_paid)}\033[0m")
-        print(f"Accessible free services: {len(accessible_free)}")
+        out = io.StringIO()
+        print("-" * 70, file=out)
+        print(f"\n{'='*70}", file=out)
+        print("SUMMARY", file=out)
+        print(f"{'='*70}", file=out)
+        print(f"Total APIs tested: {len(results)}", file=out)
+        print(f"\033[92mAccessible paid services: {len(accessible_paid)}\033[0m", file=out)
+        print(f"Accessible free services: {len(accessible_free)}", file=out)
+
+        cached_count = sum(result["cached"] for result in results)
+        if cached_count:
+            print(f"\nNote: {cached_count} result(s) came from a run in the last {CACHE_TTL} seconds"
+                  " - use --no-cache to test again", file=out)
 
         if accessible_paid:
-            print(f"\n\033[93m{'!'*70}\033[0m")
-            print("\033[93mWARNING: The following PAID services are accessible with this API key:\033[0m")
-            print(f"\033[93m{'!'*70}\033[0m\n")
+            print(f"\n\033[93m{'!'*70}\033[0m", file=out)
+            print("\033[93mWARNING: The following PAID services are accessible with this API key:\033[0m", file=out)
+            print(f"\033[93m{'!'*70}\033[0m\n", file=out)
             for svc in accessible_paid:
-                print(f"  - {svc['name']}")
-                print(f"    Cost: {svc['cost_info']}")
-            print("\n\033[93mRecommendation: Review API restrictions in Google Cloud Console\033[0m")
-            print("https://console.cloud.google.com/apis/credentials")
+                print(f"  - {svc['name']}", file=out)
+                print(f"    Cost: {svc['cost_info']}", file=out)
+            print("\n\033[93mRecommendation: Review API restrictions in Google Cloud Console\033[0m", file=out)
+            print("https://console.cloud.google.com/apis/credentials", file=out)
         else:
-            print(f"\n\033[92m{'='*70}\033[0m")
-            print("\033[92mGOOD NEWS: No paid services are accessible with this API key!\033[0m")
-            print(f"\033[92m{'='*70}\033[0m")
+            print(f"\n\033[92m{'='*70}\033[0m", file=out)
+            print("\033[92mGOOD NEWS: No paid services are accessible with this API key!\033[0m", file=out)
+            print(f"\033[92m{'='*70}\033[0m", file=out)
+        sys.stdout.write(out.getvalue())
 
 
 if __name__ == "__main__":